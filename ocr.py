@@ -0,0 +1,560 @@
+import streamlit as st
+import cv2 # For image processing
+from PIL import Image, ImageOps # For image handling
+import tesserocr # In-process Tesseract bindings
+import pdf2image
+from pdf2image import pdfinfo_from_path # To read the PDF page count
+import io # To handle byte streams
+import hashlib # To key cached OCR results on file content
+import tempfile # To hold rendered PDF pages on disk
+import subprocess # To run pdftoppm
+import os # To potentially check for Tesseract path if needed locally
+import queue # To pool idle Tesseract APIs
+import itertools
+import glob # To look for the Tesseract language data
+import threading # To detach the script context from OCR workers
+from contextlib import contextmanager
+import numpy as np
+from pypdf import PdfReader # To read the embedded text layer of PDFs
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED # To OCR pages in parallel
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+try:
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+except ImportError: # Streamlit < 1.38
+    from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+
+
+# --- Configuration (Optional: Set Tesseract data path if needed locally) ---
+# The tesserocr wheel bundles the Tesseract library but not its language data, and its
+# built-in tessdata path does not point at the system install. When this is None, the
+# TESSDATA_PREFIX environment variable is used, then the first folder in
+# TESSDATA_SEARCH_PATHS that contains eng.traineddata (this covers the apt install from
+# packages.txt on Streamlit Community Cloud). Set it if your 'tessdata' folder is elsewhere.
+# Example paths:
+# TESSDATA_PATH = r'C:\Program Files\Tesseract-OCR\tessdata'
+# TESSDATA_PATH = '/usr/share/tesseract-ocr/5/tessdata'
+# For speed, point it at a folder with the integer "tessdata_fast" models
+# (https://github.com/tesseract-ocr/tessdata_fast); Debian's tesseract-ocr-eng already ships them.
+TESSDATA_PATH = None
+TESSDATA_SEARCH_PATHS = [
+    "/usr/share/tesseract-ocr/*/tessdata", # Debian/Ubuntu (apt)
+    "/usr/share/tessdata", # Fedora/Arch
+    "/opt/homebrew/share/tessdata", # Homebrew on Apple silicon
+    "/usr/local/share/tessdata", # Homebrew on Intel, source builds
+]
+
+# Use the LSTM engine only (the fast models have no legacy engine data).
+# PSM.AUTO runs full page layout analysis; PSM.SINGLE_BLOCK is faster for plain blocks of text.
+TESSERACT_OEM = tesserocr.OEM.LSTM_ONLY
+TESSERACT_PSM = tesserocr.PSM.AUTO
+
+# PDF pages whose embedded text layer has at least this many characters are not OCR'd,
+# unless an image covers at least this fraction of the page (a scan with a stamped text layer)
+MIN_TEXT_LAYER_CHARS = 20
+SCANNED_PAGE_IMAGE_COVERAGE = 0.5
+
+# PDF pages are rendered at this resolution (pdf2image's default)
+PDF_RENDER_DPI = 200
+
+# Number of processed PDFs whose text is kept per session
+PDF_TEXT_CACHE_MAX_ENTRIES = 5
+
+# Number of rendered PDF pages kept in memory (about 4 MB each at PDF_RENDER_DPI).
+# PDFs with more pages to OCR than this are rendered without caching.
+RENDER_CACHE_MAX_PAGES = 16
+
+# Larger images are downscaled to this size (longest side, in pixels) before OCR.
+# It is the long side of an A4 page at PDF_RENDER_DPI, so rendered PDF pages are kept
+# as is while oversized scans and photos are shrunk.
+MAX_OCR_DIMENSION = 2340
+
+# Set to True to sharpen the grayscale image before thresholding (off by default for speed)
+SHARPEN_BEFORE_THRESHOLD = False
+SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+
+
+
+
+# --- Helper Functions ---
+def preprocess_image(image_obj):
+    """
+    Preprocesses the image to improve OCR accuracy.
+    The image stays a NumPy array throughout, so it is not copied back into PIL.
+    Args:
+        image_obj (PIL.Image.Image): The image to preprocess.
+    Returns:
+        numpy.ndarray: The binarized image as a boolean array (True is white),
+            or the grayscale uint8 array if preprocessing failed.
+    """
+    try:
+        # Convert the image to grayscale (PDF pages are already rendered in grayscale)
+        image = image_obj if image_obj.mode == "L" else image_obj.convert("L")
+
+        # np.asarray wraps PIL's exported pixel buffer instead of copying it again.
+        # The array is read-only, which is fine as every OpenCV step below returns a new one.
+        image_np = np.asarray(image, dtype=np.uint8)
+
+        # Downscale oversized scans, as Tesseract's cost grows with the pixel count
+        scale = min(1.0, MAX_OCR_DIMENSION / max(image_np.shape))
+        if scale < 1.0:
+            image_np = cv2.resize(image_np, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        # Optionally, sharpen the grayscale image (sharpening after thresholding
+        # would reintroduce grey levels into the binary image)
+        if SHARPEN_BEFORE_THRESHOLD:
+            image_np = cv2.filter2D(image_np, -1, SHARPEN_KERNEL)
+
+        # Apply Otsu thresholding to enhance text visibility. A single global threshold
+        # suits evenly lit document scans and is much cheaper than adaptive thresholding.
+        # A max value of 1 lets the result be viewed as booleans without a copy.
+        _, image_np = cv2.threshold(image_np, 0, 1, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+        # Tesseract skips its own Otsu thresholding pass for binary images, and no
+        # filter is applied afterwards since it would reintroduce grey levels.
+        return image_np.view(np.bool_)
+    except Exception as e:
+        st.warning(f"An error occurred during image preprocessing: {e}")
+        return np.asarray(image_obj.convert("L"))
+
+
+def set_tess_image(api, image_np):
+    """
+    Passes a preprocessed NumPy image to the Tesseract API without going through PIL.
+    Args:
+        api (tesserocr.PyTessBaseAPI): The Tesseract API to set the image on.
+        image_np (numpy.ndarray): A boolean binary image or a uint8 grayscale image.
+    """
+    height, width = image_np.shape
+    if image_np.dtype == np.bool_:
+        # Tesseract expects binary images packed 8 pixels per byte, MSB first, 1 being white
+        packed = np.packbits(image_np, axis=1)
+        api.SetImageBytes(packed.tobytes(), width, height, 0, packed.shape[1])
+    else:
+        image_np = np.ascontiguousarray(image_np)
+        api.SetImageBytes(image_np.tobytes(), width, height, 1, width)
+
+
+def find_tessdata_path():
+    """
+    Finds the folder with the Tesseract language data.
+    Returns:
+        str: The tessdata folder (with a trailing separator), or None to use the
+            library's built-in default.
+    """
+    if TESSDATA_PATH:
+        return os.path.join(TESSDATA_PATH, "")
+    if os.environ.get("TESSDATA_PREFIX"):
+        return os.path.join(os.environ["TESSDATA_PREFIX"], "")
+    for pattern in TESSDATA_SEARCH_PATHS:
+        # Newest Tesseract version first for versioned folders
+        for folder in sorted(glob.glob(pattern), reverse=True):
+            if os.path.isfile(os.path.join(folder, "eng.traineddata")):
+                return os.path.join(folder, "")
+    return None
+
+
+def create_tess_api():
+    """
+    Creates a Tesseract API, loading the language model.
+    Returns:
+        tesserocr.PyTessBaseAPI: The new Tesseract API.
+    """
+    tessdata_path = find_tessdata_path()
+    if tessdata_path:
+        return tesserocr.PyTessBaseAPI(
+            path=tessdata_path, lang="eng", oem=TESSERACT_OEM, psm=TESSERACT_PSM
+        )
+    return tesserocr.PyTessBaseAPI(lang="eng", oem=TESSERACT_OEM, psm=TESSERACT_PSM)
+
+
+@st.cache_resource
+def get_tess_api_pool():
+    """
+    Returns the pool of idle Tesseract APIs. The pool is kept across reruns and
+    sessions, so the language model is not reloaded on every interaction.
+    Returns:
+        queue.SimpleQueue: The idle Tesseract APIs.
+    """
+    return queue.SimpleQueue()
+
+
+@contextmanager
+def checkout_tess_api():
+    """
+    Takes a Tesseract API from the pool (creating one if none is idle) and returns
+    it afterwards. A single API instance is not thread safe, so each API is only
+    used by one thread at a time.
+    Yields:
+        tesserocr.PyTessBaseAPI: The Tesseract API to use.
+    """
+    pool = get_tess_api_pool()
+    try:
+        api = pool.get_nowait()
+    except queue.Empty:
+        api = create_tess_api()
+    try:
+        yield api
+    finally:
+        pool.put(api)
+
+
+def get_image_hash(image_obj):
+    """
+    Computes a content hash of a PIL Image object, used as the OCR cache key.
+    Args:
+        image_obj (PIL.Image.Image): The image to hash.
+    Returns:
+        str: The hex digest of the image mode, size, palette and pixel data.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"{image_obj.mode}{image_obj.size}".encode())
+    # Palette images with the same indices but different palettes look different
+    hasher.update(repr((image_obj.getpalette(), image_obj.info.get("transparency"))).encode())
+    hasher.update(image_obj.tobytes())
+    return hasher.hexdigest()
+
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def ocr_image_cached(image_hash, _image_obj):
+    """
+    Preprocesses and OCRs an image, caching the text by image hash so identical
+    pages (re-uploads, repeated or blank pages) are only processed once.
+    Errors are raised rather than returned, so failures are never cached.
+    Args:
+        image_hash (str): The content hash of the image (the cache key).
+        _image_obj (PIL.Image.Image): The image to process (not hashed by Streamlit).
+    Returns:
+        str: The extracted text.
+    """
+    # Preprocess the image
+    preprocessed_image = preprocess_image(_image_obj)
+
+    # Perform OCR using a pooled in-process Tesseract API
+    with checkout_tess_api() as api:
+        set_tess_image(api, preprocessed_image)
+        return api.GetUTF8Text()
+
+
+def perform_ocr_on_image(image_obj):
+    """
+    Performs OCR on a single PIL Image object.
+    Args:
+        image_obj (PIL.Image.Image): The image to process.
+    Returns:
+        str: The extracted text, or None if an error occurred.
+    """
+    try:
+        text = ocr_image_cached(get_image_hash(image_obj), image_obj)
+        return text
+    except RuntimeError as e: # Raised by tesserocr when Tesseract fails to initialize
+        st.error(
+            f"Tesseract could not be initialized: {e}\n"
+            "**For Cloud Deployment:** Ensure 'tesseract-ocr' is in your packages.txt.\n"
+            "**For Local Use:** Ensure Tesseract and its English language data are installed, "
+            "and set TESSDATA_PREFIX or TESSDATA_PATH in ocr.py if they are not found."
+            )
+        return None
+    except Exception as e:
+        st.error(f"An error occurred during OCR processing: {e}")
+        return None
+
+def extract_page_text_layer(page):
+    """
+    Extracts the embedded text layer of a PDF page and measures the largest image
+    drawn on it, as scanned pages are a page-sized image with at most a small
+    stamped text layer (page numbers, fax headers, watermarks) on top.
+    Args:
+        page (pypdf.PageObject): The page to read.
+    Returns:
+        tuple[str, float]: The page text and the fraction of the page area covered
+            by its largest image.
+    """
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    image_names = set()
+    if xobjects:
+        image_names = {
+            name for name, xobject in xobjects.get_object().items()
+            if xobject.get_object().get("/Subtype") == "/Image"
+        }
+
+    largest_image_area = 0.0
+
+    def visit_operator(operator, operands, cm_matrix, tm_matrix):
+        nonlocal largest_image_area
+        # Images are drawn into the unit square, scaled by the current transformation matrix
+        if operator == b"Do" and operands and operands[0] in image_names:
+            a, b, c, d = cm_matrix[:4]
+            largest_image_area = max(largest_image_area, abs(a * d - b * c))
+
+    text = page.extract_text(visitor_operand_before=visit_operator) or ""
+    page_area = float(page.mediabox.width) * float(page.mediabox.height)
+    return text, (largest_image_area / page_area if page_area else 0.0)
+
+
+def extract_pdf_text_layer(pdf_bytes):
+    """
+    Extracts the embedded text layer of each PDF page, so digital pages can skip OCR.
+    Pages mostly covered by an image are treated as scanned and always OCR'd,
+    whatever text layer they carry.
+    Args:
+        pdf_bytes (bytes): The byte content of the PDF file.
+    Returns:
+        list[str]: The text per page (None for pages without a usable text layer),
+            or an empty list if the PDF could not be read.
+    """
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        page_texts = []
+        for page in reader.pages:
+            try:
+                text, image_coverage = extract_page_text_layer(page)
+            except Exception:
+                text, image_coverage = "", 0.0
+            is_digital = (
+                len(text.strip()) >= MIN_TEXT_LAYER_CHARS
+                and image_coverage < SCANNED_PAGE_IMAGE_COVERAGE
+            )
+            page_texts.append(text if is_digital else None)
+        return page_texts
+    except Exception:
+        # Encrypted or malformed PDFs are simply OCR'd in full
+        return []
+
+
+def render_pdf_page(pdf_path, page_num, output_folder):
+    """
+    Renders a single PDF page with Poppler.
+    pdftoppm is called directly: pdf2image would also run pdfinfo and a pdftoppm
+    version check for every page, each parsing the whole PDF again.
+    Args:
+        pdf_path (str): Path of the PDF file.
+        page_num (int): The page to render (1-based).
+        output_folder (str): Folder where Poppler writes the page.
+    Returns:
+        PIL.Image.Image: The rendered page, or None if Poppler produced no image.
+    """
+    # pdftoppm must be in PATH (installed via packages.txt on Streamlit Cloud)
+    # -gray makes Poppler emit single-channel pages, a third of the RGB size.
+    # -singlefile writes "<prefix>.pgm" without a page number suffix.
+    output_prefix = os.path.join(output_folder, f"page_{page_num}")
+    subprocess.run(
+        [
+            "pdftoppm", "-f", str(page_num), "-l", str(page_num),
+            "-r", str(PDF_RENDER_DPI), "-gray", "-singlefile",
+            pdf_path, output_prefix,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    page_path = output_prefix + ".pgm"
+    if not os.path.exists(page_path):
+        return None
+
+    with Image.open(page_path) as image:
+        image.load()
+    # Free the disk space of the page as soon as it is loaded
+    os.remove(page_path)
+    return image
+
+
+@st.cache_data(ttl=3600, max_entries=RENDER_CACHE_MAX_PAGES, show_spinner=False)
+def render_pdf_page_cached(pdf_hash, page_num, _pdf_path, _output_folder):
+    """
+    Renders a single PDF page, caching the image by PDF hash and page number so
+    processing the same PDF again does not render it again.
+    Only used for PDFs whose OCR'd pages all fit in the cache.
+    Args:
+        pdf_hash (str): The content hash of the PDF (part of the cache key).
+        page_num (int): The page to render (1-based).
+        _pdf_path (str): Path of the PDF file (not hashed by Streamlit).
+        _output_folder (str): Folder where Poppler writes the page (not hashed by Streamlit).
+    Returns:
+        PIL.Image.Image: The rendered page, or None if Poppler produced no image.
+    """
+    return render_pdf_page(_pdf_path, page_num, _output_folder)
+
+
+def perform_ocr_on_pdf_page(pdf_path, pdf_hash, page_num, output_folder, use_render_cache):
+    """
+    Renders a single PDF page and performs OCR on it.
+    Each worker renders its next page while the others are OCR'ing theirs, so
+    Poppler rendering overlaps with Tesseract instead of running before it.
+    Args:
+        pdf_path (str): Path of the PDF file.
+        pdf_hash (str): The content hash of the PDF.
+        page_num (int): The page to process (1-based).
+        output_folder (str): Folder where Poppler writes the rendered page.
+        use_render_cache (bool): Whether to cache the rendered page.
+    Returns:
+        str: The extracted text, or None if the page could not be rendered or OCR'd.
+    """
+    if use_render_cache:
+        image = render_pdf_page_cached(pdf_hash, page_num, pdf_path, output_folder)
+    else:
+        image = render_pdf_page(pdf_path, page_num, output_folder)
+    if image is None:
+        return None
+    return perform_ocr_on_image(image)
+
+@st.cache_resource
+def get_ocr_executor():
+    """
+    Returns the OCR worker threads, started once and shared by all sessions.
+    The threads outlive each run, and concurrent users share the same workers
+    instead of each starting one Tesseract job per CPU. Callers keep at most one
+    page per worker queued, so no session can monopolize the queue.
+    Returns:
+        concurrent.futures.ThreadPoolExecutor: The OCR worker pool.
+    """
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="ocr_worker")
+
+
+def run_with_script_ctx(script_ctx, func, *args):
+    """
+    Runs a function on an OCR worker thread with the caller's script context
+    attached, so st.error/st.warning reach the session that submitted the work.
+    The context is detached again once the function returns.
+    Args:
+        script_ctx: The Streamlit script run context of the caller.
+        func (callable): The function to run.
+        *args: Arguments passed to the function.
+    Returns:
+        The return value of the function.
+    """
+    add_script_run_ctx(ctx=script_ctx)
+    try:
+        return func(*args)
+    finally:
+        # Detach the context so the idle worker does not keep the session alive.
+        # add_script_run_ctx(ctx=None) would fall back to the attached context
+        # rather than clear it, so the thread attribute is removed directly.
+        thread = threading.current_thread()
+        if hasattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME):
+            delattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME)
+
+
+def perform_ocr_on_pdf(pdf_bytes):
+    """
+    Extracts the text of each PDF page, using the embedded text layer where
+    present and converting the remaining pages to images for OCR.
+    Args:
+        pdf_bytes (bytes): The byte content of the PDF file.
+    Returns:
+        str: The concatenated extracted text from all pages, or None if an error occurred.
+    """
+    # Reuse the text of a PDF recently processed in this session
+    pdf_hash = hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+    pdf_text_cache = st.session_state.setdefault("pdf_text_cache", {})
+    if pdf_hash in pdf_text_cache:
+        # Move the entry to the end, so the cache evicts the least recently used PDF
+        pdf_text_cache[pdf_hash] = pdf_text_cache.pop(pdf_hash)
+        return pdf_text_cache[pdf_hash]
+
+    try:
+        # Write the PDF once, so Poppler can render it page by page from disk.
+        # On Streamlit Cloud, poppler-utils installed via packages.txt handles this.
+        print("PDF bytes: ", type(pdf_bytes))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = os.path.join(tmp_dir, "input.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(pdf_bytes)
+
+            total_pages = pdfinfo_from_path(pdf_path, poppler_path=None)["Pages"]
+            if not total_pages:
+                st.warning("Could not extract any images from the PDF. The PDF might be empty, corrupted, or text-based (not scanned).")
+                return None # Return None instead of empty string if no images found
+
+            # Pages with an embedded text layer are used as is; only the others are OCR'd
+            page_texts = extract_pdf_text_layer(pdf_bytes)
+            if len(page_texts) != total_pages:
+                page_texts = [None] * total_pages
+            ocr_pages = [i for i, page_text in enumerate(page_texts) if page_text is None]
+
+            # Process each page (image)
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            completed = total_pages - len(ocr_pages)
+            progress_bar.progress(completed / total_pages)
+
+            # Each task renders and OCRs one page, so rendering and OCR of different
+            # pages overlap, and only the pages in flight are held in memory.
+            # The shared workers reuse the pooled Tesseract APIs across pages.
+            # At most one page per worker is queued per call, and the next page is only
+            # submitted when one finishes, so concurrent sessions take turns on the workers.
+            # Results are stored by page index to keep the original page order.
+            executor = get_ocr_executor()
+            script_ctx = get_script_run_ctx()
+            # Rendered pages are only cached if they all fit: otherwise each page would
+            # evict one needed later, and reprocessing the PDF would never hit the cache
+            use_render_cache = len(ocr_pages) <= RENDER_CACHE_MAX_PAGES
+            pending_pages = iter(ocr_pages)
+
+            def submit_page(i):
+                return executor.submit(
+                    run_with_script_ctx, script_ctx,
+                    perform_ocr_on_pdf_page, pdf_path, pdf_hash, i + 1, tmp_dir, use_render_cache
+                )
+
+            futures = {}
+            try:
+                for i in itertools.islice(pending_pages, os.cpu_count() or 1):
+                    futures[submit_page(i)] = i
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        page_texts[futures.pop(future)] = future.result()
+                        completed += 1
+                        status_text.text(f"Processed Page {completed}/{total_pages}...")
+                        # Update progress bar
+                        progress_bar.progress(completed / total_pages)
+                        next_page = next(pending_pages, None)
+                        if next_page is not None:
+                            futures[submit_page(next_page)] = next_page
+            finally:
+                # On errors, drop the pages not started yet and wait for the running
+                # ones before the temporary folder is removed
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+
+        # Collect the page sections and join them once at the end
+        parts = []
+        for i, page_text in enumerate(page_texts):
+            page_num = i + 1
+            if page_text: # Append text only if OCR was successful for the page
+                parts.append(f"--- Page {page_num} ---\n{page_text}\n\n")
+            else:
+                # Optionally note if a page failed OCR, or just skip
+                parts.append(f"--- Page {page_num} (OCR Failed or No Text Detected) ---\n\n")
+        extracted_text = "".join(parts)
+
+        status_text.text("PDF Processing Complete.")
+        # Only cache the result if every page was OCR'd without errors
+        if None not in page_texts:
+            pdf_text_cache[pdf_hash] = extracted_text
+            while len(pdf_text_cache) > PDF_TEXT_CACHE_MAX_ENTRIES:
+                del pdf_text_cache[next(iter(pdf_text_cache))]
+        return extracted_text
+
+    except ImportError:
+         st.error("The 'pdf2image' or 'PIL' library is not installed. Please check your requirements.txt.")
+         return None
+    # Catch errors specifically related to pdf2image/poppler
+    except (pdf2image.exceptions.PDFInfoNotInstalledError,
+            pdf2image.exceptions.PDFPageCountError,
+            pdf2image.exceptions.PDFSyntaxError,
+            FileNotFoundError) as e: # FileNotFoundError can occur if poppler isn't found
+         st.error(
+             f"Error converting PDF to images: {e}\n"
+             "**For Cloud Deployment:** Ensure 'poppler-utils' is in your packages.txt.\n"
+             "**For Local Use:** Ensure Poppler is installed and in your system's PATH."
+             )
+         return None
+    except subprocess.CalledProcessError as e: # pdftoppm failed to render a page
+        st.error(f"Error converting PDF to images: {e.stderr.decode(errors='replace').strip() or e}")
+        return None
+    except Exception as e:
+        st.error(f"An unexpected error occurred during PDF processing: {e}")
+        return None
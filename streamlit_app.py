@@ -1,156 +1,12 @@
 import streamlit as st
-import cv2 # For image processing
-from PIL import Image, ImageFilter, ImageOps # For image handling
-import pytesseract
-import pdf2image
-from pdf2image import convert_from_bytes # To handle PDF files
-import io # To handle byte streams
-import os # To potentially check for Tesseract path if needed locally
-import numpy as np
+from PIL import Image # For image handling
+from ocr import perform_ocr_on_image, perform_ocr_on_pdf # OCR pipeline (see ocr.py)
 
 
 
-# --- Configuration (Optional: Set Tesseract path if needed locally) ---
-# On Streamlit Community Cloud, Tesseract should be discoverable if installed via packages.txt
-# If running locally and Tesseract is not in your PATH, you might need to set this.
-# Check common paths or where you installed it. Leave commented out for cloud deployment.
-# Example paths:
-# tesseract_path_windows = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-# if os.path.exists(tesseract_path_windows):
-#     pytesseract.pytesseract.tesseract_cmd = tesseract_path_windows
-# elif os.path.exists(tesseract_path_linux):
-#      pytesseract.pytesseract.tesseract_cmd = tesseract_path_linux
-# else:
-#      # If not found in common paths, Streamlit will rely on PATH or packages.txt
-#      pass
-
-
-
-
-# --- Helper Functions ---
-def preprocess_image(image_obj):
-    """
-    Preprocesses the image to improve OCR accuracy.
-    Args:
-        image_obj (PIL.Image.Image): The image to preprocess.
-    Returns:
-        PIL.Image.Image: The preprocessed image.
-    """
-    try:
-        # Convert the image to grayscale
-        image = image_obj.convert("L")
-
-        # Apply adaptive thresholding to enhance text visibility
-        image_np = np.array(image)
-        image_np = cv2.adaptiveThreshold(
-            image_np, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-        )
-
-        # Convert back to PIL Image
-        preprocessed_image = Image.fromarray(image_np)
-
-        # Optionally, apply additional filters (e.g., sharpening)
-        preprocessed_image = preprocessed_image.filter(ImageFilter.SHARPEN)
-
-        return preprocessed_image
-    except Exception as e:
-        st.warning(f"An error occurred during image preprocessing: {e}")
-        return image_obj 
-
-
-def perform_ocr_on_image(image_obj):
-    """
-    Performs OCR on a single PIL Image object.
-    Args:
-        image_obj (PIL.Image.Image): The image to process.
-    Returns:
-        str: The extracted text, or None if an error occurred.
-    """
-    try:
-        
-        # Preprocess the image
-        preprocessed_image = preprocess_image(image_obj)
-        
-        # Perform OCR using pytesseract
-        text = pytesseract.image_to_string(preprocessed_image)
-        return text
-    except pytesseract.TesseractNotFoundError:
-        st.error(
-            "Tesseract executable not found. \n"
-            "**For Cloud Deployment:** Ensure 'tesseract-ocr' is in your packages.txt.\n"
-            "**For Local Use:** Ensure Tesseract is installed and in your system's PATH, "
-            "or set the path manually in the script."
-            )
-        return None
-    except Exception as e:
-        st.error(f"An error occurred during OCR processing: {e}")
-        return None
-
-def perform_ocr_on_pdf(pdf_bytes):
-    """
-    Converts PDF bytes to images and performs OCR on each page.
-    Args:
-        pdf_bytes (bytes): The byte content of the PDF file.
-    Returns:
-        str: The concatenated extracted text from all pages, or None if an error occurred.
-    """
-    extracted_text = ""
-    try:
-        # Convert PDF bytes to a list of PIL Image objects
-        # poppler_path=None relies on poppler being in PATH or installed via packages.txt
-        # On Streamlit Cloud, poppler-utils installed via packages.txt handles this.
-        print("PDF bytes: ", type(pdf_bytes))
-        images = convert_from_bytes(pdf_bytes, poppler_path=None, grayscale=True)
-
-        if not images:
-            st.warning("Could not extract any images from the PDF. The PDF might be empty, corrupted, or text-based (not scanned).")
-            return None # Return None instead of empty string if no images found
-
-        # Process each page (image)
-        total_pages = len(images)
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        for i, image in enumerate(images):
-            page_num = i + 1
-            status_text.text(f"Processing Page {page_num}/{total_pages}...")
-            # Perform OCR on the image
-            page_text = perform_ocr_on_image(image)
-            if page_text: # Append text only if OCR was successful for the page
-                extracted_text += f"--- Page {page_num} ---\n{page_text}\n\n"
-            else:
-                # Optionally note if a page failed OCR, or just skip
-                extracted_text += f"--- Page {page_num} (OCR Failed or No Text Detected) ---\n\n"
-            # Update progress bar
-            progress_bar.progress((i + 1) / total_pages)
-
-        status_text.text("PDF Processing Complete.")
-        return extracted_text
-
-    except ImportError:
-         st.error("The 'pdf2image' or 'PIL' library is not installed. Please check your requirements.txt.")
-         return None
-    # Catch errors specifically related to pdf2image/poppler
-    except (pdf2image.exceptions.PDFInfoNotInstalledError,
-            pdf2image.exceptions.PDFPageCountError,
-            pdf2image.exceptions.PDFSyntaxError,
-            FileNotFoundError) as e: # FileNotFoundError can occur if poppler isn't found
-         st.error(
-             f"Error converting PDF to images: {e}\n"
-             "**For Cloud Deployment:** Ensure 'poppler-utils' is in your packages.txt.\n"
-             "**For Local Use:** Ensure Poppler is installed and in your system's PATH."
-             )
-         return None
-    except Exception as e:
-        st.error(f"An unexpected error occurred during PDF processing: {e}")
-        return None
-
-
-
-# --- Streamlit App UI ---
-st.set_page_config(page_icon=":page_with_curl:", page_title="Simple OCR App", layout='wide')
-
-st.markdown("""
+# --- Page Chrome ---
+# Bootstrap assets and the bottom navbar, emitted on every run
+NAVBAR_HTML = """
 
 <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css" rel="stylesheet" integrity="sha384-QWTKZyjpPEjISv5WaRU9OFeRpok6YctnYmDr5pNlyT2bRjXh0JMhjY6hW+ALEwIH" crossorigin="anonymous"> 
 <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css">
@@ -164,10 +20,29 @@ st.markdown("""
  </div>
  </div>
 </nav>
-""", unsafe_allow_html=True)
+"""
+
+
+@st.cache_resource
+def load_page_chrome():
+    """
+    Builds the page chrome (navbar markup and style.css) once per server process.
+    Both are sent as a single markdown element with blank lines and indentation
+    removed, keeping the payload re-sent on every rerun small. The chrome still has
+    to be emitted on every run, as Streamlit clears elements a rerun does not emit.
+    Returns:
+        str: The navbar HTML followed by the stylesheet wrapped in a <style> tag.
+    """
+    with open("style.css") as f:
+        chrome = NAVBAR_HTML + '<style>{}</style>'.format(f.read())
+    return "\n".join(line.strip() for line in chrome.splitlines() if line.strip())
 
-with open("style.css") as f:
-    st.markdown('<style>{}</style>'.format(f.read()), unsafe_allow_html=True)
+
+
+# --- Streamlit App UI ---
+st.set_page_config(page_icon=":page_with_curl:", page_title="Simple OCR App", layout='wide')
+
+st.markdown(load_page_chrome(), unsafe_allow_html=True)
 
 
 st.title("📄 OCR Application by Aakrit")
@@ -204,18 +79,20 @@ if uploaded_file is not None:
         # Show spinner during processing
         with st.spinner(f'Processing {file_type}... This may take a moment.'):
             try:
-                # Read the file bytes
-                file_bytes = uploaded_file.getvalue()
-
                 if file_type == 'Image':
-                    # Convert image bytes to PIL Image object
-                    image = Image.open(io.BytesIO(file_bytes))
+                    # Open the uploaded file directly (it is already an in-memory buffer)
+                    uploaded_file.seek(0)
+                    image = Image.open(uploaded_file)
+                    image.load()
                     # Display the uploaded image (optional, good for confirmation)
                     st.image(image, caption=f"Uploaded Image: {uploaded_file.name}", use_column_width=True)
                     # Perform OCR
                     extracted_text = perform_ocr_on_image(image)
 
                 elif file_type == 'PDF':
+                    # Read the file bytes (getvalue() shares the upload buffer and,
+                    # unlike read(), does not depend on the current file position)
+                    file_bytes = uploaded_file.getvalue()
                     # Perform OCR on the PDF bytes
                     extracted_text = perform_ocr_on_pdf(file_bytes)
 